@@ -9,8 +9,12 @@ MT5 -> Robinhood Copier with Robust Exception Handling
 2) Respects market hours (9:30am to 4:00pm EST, M-F).
 3) Checks pattern day trade (PDT) constraints if the account < $25k.
 4) Closes corresponding Robinhood positions if MT5 positions are closed.
-5) Retries logins and gracefully handles exceptions in the main monitoring loop.
-6) Passes the explicit 'rhs_account_number' to each .robinhood.orders call.
+   Copied positions and day trade counts are kept in 'state.db', so a
+   restart neither forgets open copies nor undercounts day trades.
+5) Retries logins and gracefully handles exceptions in the main monitoring loop;
+   SIGINT/SIGTERM shut it down cleanly (MT5 shutdown, Robinhood logout).
+6) Places every order on the explicit 'rhs_account_number' account, with a
+   per-trade ref_id so a retried submit can't be filled twice.
 
 Note:
  - We add try/except around critical sections so the script 
@@ -24,20 +28,439 @@ import robin_stocks as rs
 import time
 import os
 import json
+import uuid
+import shelve
+import random
+import signal
+import asyncio
+import functools
+import queue
+import logging
+import logging.handlers
+import collections
+import threading
+import concurrent.futures
 import datetime
 import pytz
+import requests
+from requests.adapters import HTTPAdapter
 
 from datetime import datetime as dt, timedelta, date
+from email.utils import parsedate_to_datetime
 
 # ------------------- Global Variables -------------------
-day_trades_count = {}  # in-memory dict for day trade usage
+log = logging.getLogger("mt5rh")
+LOG_FILE = "mt5rh.log"
+
+# in-memory day trade usage: date => count, oldest first, last 7 days only
+day_trades_count = collections.OrderedDict()
+# held while reading/updating day_trades_count: PDT checks run on rh_pool
+# threads while closes record day trades on the event loop
+_day_trades_lock = threading.Lock()
 account_number = None  # we'll set after logging in
 # Path to local 'accounts.json' for MT5 credentials
 file_path = "accounts.json"
+# Last parsed 'file_path': its st_mtime_ns and validated account_1 (None if invalid)
+_creds_cache = {"mtime": 0, "data": None}
+# The underlying every MT5 trade is mirrored onto, as same-day options
+UNDERLYING_SYMBOL = "TSLA"
+
+# shelve file for state that must survive a restart: day trade counts,
+# MT5 ticket => Robinhood position map, order ref_ids
+state_file = "state.db"
+
+_EASTERN = pytz.timezone('US/Eastern')
+# today's 9:30 / 16:00 Eastern, see is_market_open_now
+_market_hours_cache = {"date": None, "open": None, "close": None}
+
+# Retry backoff: first retry within 0.5s, ceiling doubling up to 5 minutes
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 300
+# Random delay before the first login, seconds (see monitor_trades_forever)
+STARTUP_JITTER = 30
+# On shutdown, how long opens/closes in flight may take to finish, seconds
+SHUTDOWN_GRACE = 30
+
+# MT5 poll interval: 2s while positions change, doubling up to 30s when idle
+POLL_INTERVAL = 2
+POLL_MAX_INTERVAL = 30
+
+# Robinhood starts throttling around 60 requests/minute; stay below that
+RH_REQUESTS_PER_MINUTE = 50
+
+# Submit attempts per order; retries reuse the order's ref_id
+ORDER_MAX_TRIES = 5
+# Polls that retry an RH close that wasn't placed before the ticket is dropped
+CLOSE_MAX_TRIES = 10
+
+# How long a fetched Robinhood account profile is reused, seconds
+PROFILE_TTL = 60
+# How long an option's bid/ask is reused (e.g. open and close in quick succession)
+OPTION_QUOTE_TTL = 30
+
+# AIMD limit on concurrent RH calls: +1 after a window of fast calls, halved on errors
+RH_MAX_CONCURRENCY = 8
+# Starting limit: lets the open's lookups run side by side from the first trade
+RH_INITIAL_CONCURRENCY = RH_MAX_CONCURRENCY // 2
+RH_LATENCY_TARGET = 0.5  # seconds, average over RH_LATENCY_WINDOW calls
+RH_LATENCY_WINDOW = 20
+
+# Circuit breaker: this many 429/5xx responses in a row stop all RH calls
+# for BREAKER_COOLDOWN seconds, doubling per reopen (up to 32x)
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 300
+
+
+def setup_logging():
+    """
+    Send 'log' through a QueueHandler: the logging thread only enqueues,
+    and a QueueListener thread does the console and rotating LOG_FILE
+    writes, so a slow terminal or disk never stalls the monitor loop.
+    Returns the listener; stop() it on exit to flush.
+    """
+    log_queue = queue.Queue(-1)
+    formatter = logging.Formatter("%(asctime)s %(levelname)s %(threadName)s %(message)s")
+    file_handler = logging.handlers.RotatingFileHandler(LOG_FILE, maxBytes=10_000_000, backupCount=5)
+    console_handler = logging.StreamHandler()
+    for handler in (file_handler, console_handler):
+        handler.setFormatter(formatter)
+
+    listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler)
+    listener.start()
+    log.addHandler(logging.handlers.QueueHandler(log_queue))
+    log.setLevel(logging.INFO)
+    log.propagate = False
+    return listener
+
+
+def _backoff(attempt):
+    """
+    Seconds to wait before retry number 'attempt' (0-based), with
+    "full jitter": uniform between 0 and an exponential ceiling capped
+    at BACKOFF_CAP, so copiers restarted together spread out instead
+    of retrying in lockstep.
+    """
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+# ---------------------------------------------------------
+# 0. Robinhood rate limiting (HTTP 429 / Retry-After)
+# ---------------------------------------------------------
+class RateLimited(Exception):
+    """Raised when Robinhood answers HTTP 429 (Too Many Requests)."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Robinhood rate limit hit, retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+_throttle_until = 0.0  # time.monotonic() before which we make no RH calls
+_throttle_attempt = 0  # consecutive 429s without a Retry-After header
+_rh_calls = collections.deque()  # time.monotonic() of each RH request, last 60s
+# Per thread: Retry-After of a 429 seen by _check_rate_limit during the
+# current _rh_call (hooks run on the thread that made the request)
+_rh_local = threading.local()
+_rh_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=RH_MAX_CONCURRENCY)
+_profile_cache = {"data": None, "ts": 0.0}  # see get_cached_profile
+_profile_lock = threading.Lock()
+_option_chains = {}  # (symbol, exp_date, option_type) => {strike: instrument}
+_option_quotes = {}  # instrument url => (time.monotonic(), market data)
+_option_lock = threading.Lock()
+_state_shelf = None  # opened on first use, see _open_state
+_state_lock = threading.Lock()
+
+# Worker threads for copying trades; _rh_call caps how many hit RH at once
+rh_pool = concurrent.futures.ThreadPoolExecutor(max_workers=RH_MAX_CONCURRENCY)
+# Independent lookups within one trade. Kept apart from rh_pool so a
+# worker never waits on a task queued behind it in its own pool.
+rh_lookup_pool = concurrent.futures.ThreadPoolExecutor(max_workers=RH_MAX_CONCURRENCY)
+_rh_cond = threading.Condition()
+_rh_aimd = {
+    "limit": RH_INITIAL_CONCURRENCY,  # current concurrency limit
+    "active": 0,  # RH calls in flight
+    "latencies": collections.deque(maxlen=RH_LATENCY_WINDOW),
+}
+_breaker = {
+    "failures": 0,  # 429/5xx responses in a row
+    "open_until": 0.0,  # time.monotonic() before which _rh_call returns None
+    "consec_opens": 0,  # times opened since the last good response
+}
+
+
+def _parse_retry_after(value):
+    """
+    Retry-After is either a number of seconds or an HTTP date.
+    Returns seconds to wait, or None if absent/unparseable.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - dt.now(datetime.timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def _check_rate_limit(resp, *args, **kwargs):
+    """
+    'response' hook on the robin_stocks session. On a 429 we record
+    how long to stay quiet (Retry-After, or exponential backoff if the
+    header is missing); _rh_call then raises RateLimited.
+    Never raises itself: robin_stocks' request_post swallows exceptions
+    (so a 429 would be lost) and, in its json=True path, would skip
+    resetting the session's Content-Type.
+    """
+    global _throttle_until, _throttle_attempt
+
+    _rh_calls.append(time.monotonic())
+    _record_breaker(resp.status_code)
+
+    if resp.status_code != 429:
+        _throttle_attempt = 0
+        return
+
+    retry_after = _parse_retry_after(resp.headers.get("Retry-After"))
+    if retry_after is None:
+        retry_after = _backoff(_throttle_attempt)
+        _throttle_attempt += 1
+
+    _throttle_until = max(_throttle_until, time.monotonic() + retry_after)
+    invalidate_profile_cache()
+    log.warning(f"[RH] HTTP 429 from {resp.url}, pausing for {retry_after:.1f}s")
+    _rh_local.retry_after = retry_after
+
+
+def _record_breaker(status_code):
+    """
+    Circuit breaker bookkeeping for one RH response. BREAKER_THRESHOLD
+    429/5xx in a row open the breaker. The count isn't reset on opening,
+    so once the cooldown ends a single failed probe reopens it, for
+    twice as long.
+    """
+    with _rh_cond:
+        if status_code != 429 and status_code < 500:
+            _breaker["failures"] = 0
+            _breaker["consec_opens"] = 0
+            return
+
+        _breaker["failures"] += 1
+        now = time.monotonic()
+        if _breaker["failures"] >= BREAKER_THRESHOLD and now >= _breaker["open_until"]:
+            cooldown = BREAKER_COOLDOWN * 2 ** min(_breaker["consec_opens"], 5)
+            _breaker["open_until"] = now + cooldown
+            _breaker["consec_opens"] += 1
+            log.error(f"[RH] {_breaker['failures']} failed responses in a row (last HTTP {status_code}), "
+                      f"circuit breaker open for {cooldown:.0f}s")
+
+
+def breaker_open():
+    """True while the circuit breaker blocks all RH calls."""
+    return time.monotonic() < _breaker["open_until"]
+
+
+def install_rate_limit_hook():
+    """
+    Prepare the requests.Session that every rs.robinhood.* call goes
+    through: attach _check_rate_limit, and size its keep-alive pool so
+    RH_MAX_CONCURRENCY parallel calls each reuse a warm connection
+    instead of paying a fresh TCP+TLS handshake. Safe to call more
+    than once.
+    """
+    session = rs.robinhood.helper.SESSION
+    hooks = session.hooks["response"]
+    if _check_rate_limit not in hooks:
+        hooks.append(_check_rate_limit)
+
+    if session.get_adapter("https://api.robinhood.com/") is not _rh_adapter:
+        session.mount("https://", _rh_adapter)
+
+
+def _rh_call(fn, *args, **kwargs):
+    """
+    Call an rs.robinhood.* function once all of these allow it:
+      - no Retry-After window is pending (_throttle_until)
+      - fewer than RH_REQUESTS_PER_MINUTE requests in the last 60s
+        (counted by _check_rate_limit, so paginated or multi-request
+        robin_stocks helpers are counted in full)
+      - fewer than _rh_aimd["limit"] calls already in flight
+    Cached lookups (profile, chains, quotes) return before reaching this,
+    so they take no slot and add no latency sample.
+    While the circuit breaker is open (see _record_breaker) it returns
+    None straight away, without touching the network.
+    Raises RateLimited if any request made by 'fn' got a 429, whatever
+    'fn' itself returned or raised.
+    Thread-safe; used from the rh_pool workers.
+    """
+    with _rh_cond:
+        while True:
+            now = time.monotonic()
+            if now < _breaker["open_until"]:
+                return None
+            while _rh_calls and now - _rh_calls[0] >= 60:
+                _rh_calls.popleft()
+
+            if _throttle_until > now:
+                wait = _throttle_until - now
+            elif len(_rh_calls) >= RH_REQUESTS_PER_MINUTE:
+                wait = 60 - (now - _rh_calls[0])
+                log.warning(f"[RH] {len(_rh_calls)} requests in the last minute, waiting {wait:.1f}s")
+            elif _rh_aimd["active"] >= _rh_aimd["limit"]:
+                wait = None  # until a running call finishes
+            else:
+                break
+            _rh_cond.wait(wait)
+
+        _rh_aimd["active"] += 1
+
+    _rh_local.retry_after = None
+    start = time.monotonic()
+    ok = False
+    try:
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as ex:
+            if _rh_local.retry_after is not None:
+                raise RateLimited(_rh_local.retry_after) from ex
+            raise
+        if _rh_local.retry_after is not None:
+            raise RateLimited(_rh_local.retry_after)
+        ok = True
+        return result
+    finally:
+        _rh_release(time.monotonic() - start, ok)
+
+
+def _rh_release(elapsed, ok):
+    """
+    AIMD update after an RH call: halve the concurrency limit on any
+    error (429, timeout, ...); raise it by one after a full window of
+    calls averaging under RH_LATENCY_TARGET.
+    """
+    with _rh_cond:
+        _rh_aimd["active"] -= 1
+        latencies = _rh_aimd["latencies"]
+        if not ok:
+            _rh_aimd["limit"] = max(1, _rh_aimd["limit"] // 2)
+            latencies.clear()
+        else:
+            latencies.append(elapsed)
+            if len(latencies) == latencies.maxlen and sum(latencies) / len(latencies) <= RH_LATENCY_TARGET:
+                _rh_aimd["limit"] = min(RH_MAX_CONCURRENCY, _rh_aimd["limit"] + 1)
+                latencies.clear()
+        _rh_cond.notify_all()
+
+
+def get_cached_profile(ttl=PROFILE_TTL):
+    """
+    Return the Robinhood account profile, fetching it at most once
+    per 'ttl' seconds. Concurrent callers share a single fetch.
+    """
+    with _profile_lock:
+        if _profile_cache["data"] is not None and time.monotonic() - _profile_cache["ts"] < ttl:
+            return _profile_cache["data"]
+
+        profile = _rh_call(rs.robinhood.profiles.load_account_profile, info=None)
+        if profile:
+            _profile_cache["data"] = profile
+            _profile_cache["ts"] = time.monotonic()
+        return profile
+
+
+def invalidate_profile_cache():
+    """Force the next get_cached_profile() to hit Robinhood."""
+    _profile_cache["data"] = None
+
+
+def _open_state():
+    """The persistent state shelf; callers must hold _state_lock."""
+    global _state_shelf
+    if _state_shelf is None:
+        _state_shelf = shelve.open(state_file)
+    return _state_shelf
+
+
+def load_state():
+    """
+    Restore day_trades_count from 'state_file' and return the saved
+    MT5 ticket => (rh_info, open_time) map ({} on first run).
+    Dates are stored as ISO strings.
+    """
+    global day_trades_count
+
+    with _state_lock:
+        state = _open_state()
+        saved_days = state.get("day_trades_count", {})
+        saved_tickets = state.get("ticket_to_rh", {})
+
+    day_trades_count = collections.OrderedDict(
+        sorted((date.fromisoformat(day), count) for day, count in saved_days.items())
+    )
+    _prune_day_trades(cutoff=date.today() - timedelta(days=7))
+
+    return {
+        ticket: (rh_info, dt.fromisoformat(open_time))
+        for ticket, (rh_info, open_time) in saved_tickets.items()
+    }
+
+
+def save_day_trades():
+    """Mirror day_trades_count to 'state_file'."""
+    with _state_lock:
+        state = _open_state()
+        state["day_trades_count"] = {day.isoformat(): count for day, count in day_trades_count.items()}
+        state.sync()
+
+
+def save_ticket_map(ticket_to_rh):
+    """Mirror the MT5 ticket => (rh_info, open_time) map to 'state_file'."""
+    with _state_lock:
+        state = _open_state()
+        state["ticket_to_rh"] = {
+            ticket: (rh_info, open_time.isoformat())
+            for ticket, (rh_info, open_time) in ticket_to_rh.items()
+        }
+        state.sync()
+
 
 # ---------------------------------------------------------
 # 1. Repeated login attempts for MT5
 # ---------------------------------------------------------
+def _load_mt5_credentials():
+    """
+    'account_1' from 'file_path', validated. The file is only re-read
+    when its mtime changes, so login retries while the user fixes it
+    don't re-parse it each time. None if it is missing fields or invalid.
+    """
+    mtime = os.stat(file_path).st_mtime_ns
+    if mtime == _creds_cache["mtime"]:
+        if _creds_cache["data"] is None:
+            log.warning(f"[MT5] {file_path} is still invalid, waiting for it to be edited.")
+        return _creds_cache["data"]
+
+    account_1 = None
+    try:
+        with open(file_path, 'r') as json_file:
+            data = json.load(json_file)
+        account_1 = data["account_1"]
+        login = account_1.get("login")
+        if not isinstance(login, int) or isinstance(login, bool):
+            raise ValueError(f"'login' must be an integer, got {login!r}")
+        for key in ("password", "server"):
+            if not isinstance(account_1.get(key), str) or not account_1[key]:
+                raise ValueError(f"'{key}' must be a non-empty string")
+    except Exception as e:
+        log.error(f"[MT5] Error loading credentials from {file_path}: {e}", exc_info=True)
+        account_1 = None
+
+    _creds_cache["mtime"] = mtime
+    _creds_cache["data"] = account_1
+    return account_1
+
+
 def login_to_mt5_account_loop():
     """
     Repeatedly attempt to:
@@ -46,7 +469,8 @@ def login_to_mt5_account_loop():
       3) Load credentials from file
       4) Log in
 
-    If login fails, sleep and try again, indefinitely.
+    Returns True on success, False on failure. The caller retries
+    with exponential backoff (see _backoff).
     """
     global file_path
 
@@ -61,41 +485,36 @@ def login_to_mt5_account_loop():
     if not os.path.exists(file_path):
         with open(file_path, 'w') as json_file:
             json.dump(default_data, json_file, indent=4)
-        print(f"{file_path} created.\nPlease fill with correct MT5 account credentials!")
+        log.warning(f"{file_path} created. Please fill with correct MT5 account credentials!")
         # We won't exit; we'll keep trying, but realistically 
         # the user must fill credentials or the loop will be infinite:
-        time.sleep(15)
         return False
 
-    # Load credentials
+    # Load credentials (cached until the file changes)
     try:
-        with open(file_path, 'r') as json_file:
-            data = json.load(json_file)
-        account_1 = data["account_1"]
-    except Exception as e:
-        print(f"[MT5] Error loading credentials from {file_path}: {e}")
-        time.sleep(15)
+        account_1 = _load_mt5_credentials()
+    except OSError as e:
+        log.error(f"[MT5] Error loading credentials from {file_path}: {e}", exc_info=True)
+        return False
+    if account_1 is None:
         return False
 
     # Attempt to log in
     try:
         mt5.shutdown()  # in case a session is open
         if not mt5.initialize():
-            print(f"[MT5] initialize() failed, error code: {mt5.last_error()}")
-            time.sleep(15)
+            log.warning(f"[MT5] initialize() failed, error code: {mt5.last_error()}")
             return False
 
         if not mt5.login(account_1['login'], account_1['password'], account_1['server']):
-            print(f"[MT5] Failed to connect to account {account_1['login']}")
-            time.sleep(15)
+            log.warning(f"[MT5] Failed to connect to account {account_1['login']}")
             return False
 
-        print(f"[MT5] Connected to account {account_1['login']}")
+        log.info(f"[MT5] Connected to account {account_1['login']}")
         return True
 
     except Exception as ex:
-        print(f"[MT5] Exception during login: {ex}")
-        time.sleep(15)
+        log.error(f"[MT5] Exception during login: {ex}", exc_info=True)
         return False
 
 
@@ -104,10 +523,12 @@ def login_to_mt5_account_loop():
 # ---------------------------------------------------------
 def login_to_robinhood_loop():
     """
-    Repeatedly attempt to log in to Robinhood using environment 
-    variables for user/password. If login fails, sleep and try again.
-    Once logged in, retrieve the 'rhs_account_number' from the 
-    user's profile.
+    Attempt to log in to Robinhood using environment variables for
+    user/password. Once logged in, retrieve the 'rhs_account_number'
+    from the user's profile.
+
+    Returns True on success, False on failure. The caller retries
+    with exponential backoff (see _backoff).
     """
     global account_number
 
@@ -115,37 +536,37 @@ def login_to_robinhood_loop():
     r_pass = os.environ.get("robinhood_password")
 
     if not r_user or not r_pass:
-        print("[ERROR] Robinhood credentials not found in env variables (robinhood_username, robinhood_password).")
-        print("Sleeping 15s and will retry...")
-        time.sleep(15)
+        log.error("[Robinhood] Credentials not found in env variables (robinhood_username, robinhood_password).")
+        return False
+
+    if breaker_open():
+        log.warning("[Robinhood] Circuit breaker open, not logging in yet.")
         return False
 
     try:
-        rs.robinhood.authentication.login(
+        _rh_call(
+            rs.robinhood.authentication.login,
             username=r_user,
             password=r_pass,
             expiresIn=86400,  # 24 hours
             by_sms=True
         )
-        print("[Robinhood] Logged in successfully.")
+        log.info("[Robinhood] Logged in successfully.")
     except Exception as ex:
-        print(f"[Robinhood] Login failed: {ex}")
-        print("Sleeping 15s and will retry...")
-        time.sleep(15)
+        log.error(f"[Robinhood] Login failed: {ex}", exc_info=True)
         return False
 
     # Attempt to load profile to get account_number
     try:
-        profile_data = rs.robinhood.profiles.load_account_profile(info=None)
+        invalidate_profile_cache()  # new session, don't trust the old one
+        profile_data = get_cached_profile()
         local_acc_number = profile_data.get("rhs_account_number")
         # ensure it's a string
         local_acc_number = str(local_acc_number)
         account_number = local_acc_number
-        print(f"[Robinhood] Using account_number='{account_number}'.")
+        log.info(f"[Robinhood] Using account_number='{account_number}'.")
     except Exception as ex:
-        print(f"[Robinhood] Could not load profile or extract account_number: {ex}")
-        print("Sleeping 15s and will retry...")
-        time.sleep(15)
+        log.error(f"[Robinhood] Could not load profile or extract account_number: {ex}", exc_info=True)
         return False
 
     return True
@@ -160,19 +581,22 @@ def is_market_open_now():
     Eastern Time, Monday-Friday.
     """
     try:
-        eastern = pytz.timezone('US/Eastern')
-        now_est = dt.now(eastern)
+        now_est = dt.now(_EASTERN)
 
         # 0=Mon ... 6=Sun
         if now_est.weekday() >= 5:
             return False
 
-        open_time = now_est.replace(hour=9, minute=30, second=0, microsecond=0)
-        close_time = now_est.replace(hour=16, minute=0, second=0, microsecond=0)
-        return (now_est >= open_time) and (now_est <= close_time)
+        # open/close only change with the date; build them once per day
+        cache = _market_hours_cache
+        if cache["date"] != now_est.date():
+            cache["open"] = now_est.replace(hour=9, minute=30, second=0, microsecond=0)
+            cache["close"] = now_est.replace(hour=16, minute=0, second=0, microsecond=0)
+            cache["date"] = now_est.date()
+        return cache["open"] <= now_est <= cache["close"]
 
     except Exception as ex:
-        print(f"[Market Hours Check] Error: {ex}")
+        log.error(f"[Market Hours Check] Error: {ex}", exc_info=True)
         # If we can't determine, assume not open
         return False
 
@@ -191,7 +615,7 @@ def account_equity_and_pdt_check():
     global day_trades_count
 
     try:
-        profile = rs.robinhood.profiles.load_account_profile(info=None)
+        profile = get_cached_profile()
         portfolio_cash_str = profile.get("portfolio_cash", "0")
         account_val = float(portfolio_cash_str)
     except Exception as ex:
@@ -201,17 +625,11 @@ def account_equity_and_pdt_check():
     if account_val >= 25000:
         return True, "Account >= $25k, no PDT restrictions"
 
-    # If < 25k, check in-memory day trades
-    cutoff_date = dt.now() - timedelta(days=7)
-    day_trades_in_7_days = 0
-    for day_str, count in day_trades_count.items():
-        try:
-            day_dt = dt.strptime(day_str, "%Y-%m-%d")
-            if day_dt >= cutoff_date:
-                day_trades_in_7_days += count
-        except:
-            # skip any malformed keys
-            continue
+    # If < 25k, check in-memory day trades. record_day_trade_if_applicable
+    # keeps at most a week of entries, so this is a handful of additions.
+    cutoff = date.today() - timedelta(days=7)
+    with _day_trades_lock:
+        day_trades_in_7_days = sum(count for day, count in day_trades_count.items() if day > cutoff)
 
     if day_trades_in_7_days >= 3:
         return False, "PDT limit reached (3+ day trades in last 7 days)"
@@ -220,60 +638,222 @@ def account_equity_and_pdt_check():
 
 
 # ---------------------------------------------------------
-# 5. Generic function: place an option order (buy/sell)
+# 5. Option chain/quotes and generic order placement (buy/sell)
 # ---------------------------------------------------------
+def get_option_chain(symbol, exp_date, option_type):
+    """
+    {strike (float): option instrument} for one expiration and type.
+    Listed strikes don't change intraday, so this is fetched once per
+    (symbol, exp_date, option_type) and then served from memory.
+    """
+    key = (symbol, exp_date, option_type)
+    with _option_lock:
+        chain = _option_chains.get(key)
+        if chain is None:
+            instruments = _rh_call(
+                rs.robinhood.options.find_tradable_options,
+                symbol,
+                expirationDate=exp_date,
+                optionType=option_type
+            )
+            chain = {
+                float(inst["strike_price"]): inst
+                for inst in instruments or ()
+                if inst and inst.get("expiration_date") == exp_date
+            }
+            if chain:
+                # drop expired chains (and their quotes) as days roll over
+                stale = [k for k in _option_chains if k[1] < exp_date]
+                for old_key in stale:
+                    del _option_chains[old_key]
+                if stale:
+                    _option_quotes.clear()
+                _option_chains[key] = chain
+        return chain
+
+
+def get_option_quote(instrument, ttl=OPTION_QUOTE_TTL):
+    """
+    Market data (bid_price, ask_price, ...) for one option instrument,
+    reused for 'ttl' seconds. One request, against the instrument url we
+    already hold, instead of robin_stocks' instrument+marketdata pair.
+    """
+    url = instrument["url"]
+    with _option_lock:
+        cached = _option_quotes.get(url)
+    if cached and time.monotonic() - cached[0] < ttl:
+        return cached[1]
+
+    data = _rh_call(
+        rs.robinhood.helper.request_get,
+        rs.robinhood.urls.marketdata_options_url(),
+        'results',
+        {"instruments": url}
+    )
+    quote = data[0] if data else None
+    if quote:
+        with _option_lock:
+            _option_quotes[url] = (time.monotonic(), quote)
+    return quote
+
+
+def order_ref_id(ticket, intent):
+    """
+    Stable Robinhood ref_id for one logical order, e.g. the 'open' or
+    'close' of an MT5 ticket. Robinhood drops a second order carrying an
+    already-seen ref_id, so resubmitting with the same key (retry, or
+    restart mid-submit) can't double-fill. Persisted in 'state_file'.
+    """
+    if ticket is None:
+        return str(uuid.uuid4())
+
+    key = f"ref_id:{ticket}:{intent}"
+    with _state_lock:
+        state = _open_state()
+        if key not in state:
+            state[key] = str(uuid.uuid4())
+            state.sync()
+        return state[key]
+
+
+def forget_order_ref_ids(ticket):
+    """Drop the stored ref_ids of an MT5 ticket once it's fully handled."""
+    with _state_lock:
+        state = _open_state()
+        for intent in ("open", "close"):
+            state.pop(f"ref_id:{ticket}:{intent}", None)
+        state.sync()
+
+
+def _submit_option_order(account_url, option_url, side, position_effect,
+                         credit_or_debit, price, quantity, ref_id):
+    """
+    POST one option limit order. Same payload as robin_stocks'
+    order_buy_option_limit / order_sell_option_limit, but with our
+    ref_id: those helpers mint a fresh uuid4 per call, which would turn
+    a retried submit into a second order.
+
+    Posts on the robin_stocks session directly rather than through
+    request_post, which swallows errors and hands back 400-403 rejection
+    bodies as if they were orders: HTTP errors raise here instead.
+    """
+    payload = {
+        'account': account_url,
+        'direction': credit_or_debit,
+        'time_in_force': 'gfd',
+        'legs': [
+            {'position_effect': position_effect, 'side': side,
+                'ratio_quantity': 1, 'option': option_url},
+        ],
+        'type': 'limit',
+        'trigger': 'immediate',
+        'price': price,
+        'quantity': quantity,
+        'override_day_trade_checks': False,
+        'override_dtbp_checks': False,
+        'ref_id': ref_id,
+    }
+    # Per-request header: the session's form Content-Type would win over json=
+    resp = rs.robinhood.helper.SESSION.post(
+        rs.robinhood.urls.option_orders_url(),
+        json=payload,
+        headers={'Content-Type': 'application/json'},
+        timeout=16
+    )
+    resp.raise_for_status()
+    return resp.json()
+
+
+# Per-side order fields, looked up rather than branched on so they can't
+# drift apart from 'side'
+_CD = {'buy': 'debit', 'sell': 'credit'}
+_OPPOSITE_SIDE = {'buy': 'sell', 'sell': 'buy'}
+
+
 def place_robinhood_option_order(symbol, exp_date, strike, option_type,
-                                 quantity, side, position_effect, limit_price):
+                                 quantity, side, position_effect, limit_price,
+                                 ref_id=None, option_url=None):
     """
-    Submits an options limit order via .robinhood.orders.
+    Submits an options limit order for 'account_number'.
     side: 'buy' or 'sell'
     position_effect: 'open' or 'close'
-    credit_or_debit: 'debit' if buying, 'credit' if selling
+    credit_or_debit: 'debit' if buying, 'credit' if selling (see _CD)
+    ref_id: idempotency key (see order_ref_id); a fresh one if omitted
+    option_url: instrument url, if known; otherwise looked up from the chain
+
+    Transient failures (429, 5xx, connection errors, timeouts) are retried
+    up to ORDER_MAX_TRIES times with the same ref_id; a 4xx rejection is
+    logged and not retried.
     """
-    global account_number
+    if ref_id is None:
+        ref_id = str(uuid.uuid4())
 
     try:
         limit_price_str = f"{limit_price:.2f}"
-        print(f"[RH] {side.upper()} {option_type.upper()} x{quantity}, "
-              f"sym={symbol}, exp={exp_date}, strike={strike}, "
-              f"posEffect={position_effect}, limit={limit_price_str}")
-
-        if side.lower() == 'buy':
-            # buy => credit_or_debit='debit'
-            order_resp = rs.robinhood.orders.order_buy_option_limit(
-                positionEffect=position_effect,
-                credit_or_debit='debit',
-                price=limit_price,
-                symbol=symbol,
-                quantity=quantity,
-                expirationDate=exp_date,
-                strike=strike,
-                optionType=option_type,
-                timeInForce='gfd',
-                account_number=account_number
-            )
-        else:
-            # sell => credit_or_debit='credit'
-            order_resp = rs.robinhood.orders.order_sell_option_limit(
-                positionEffect=position_effect,
-                credit_or_debit='credit',
-                price=limit_price,
-                symbol=symbol,
-                quantity=quantity,
-                expirationDate=exp_date,
-                strike=strike,
-                optionType=option_type,
-                timeInForce='gfd',
-                account_number=account_number
-            )
+        log.info(f"[RH] {side.upper()} {option_type.upper()} x{quantity}, "
+                 f"sym={symbol}, exp={exp_date}, strike={strike}, "
+                 f"posEffect={position_effect}, limit={limit_price_str}, ref_id={ref_id}")
 
-        return order_resp
+        side = side.lower()
+        credit_or_debit = _CD[side]
+
+        # The cached profile is the 'account_number' account (see login)
+        account_url = get_cached_profile()["url"]
+        if option_url is None:
+            option_url = get_option_chain(symbol, exp_date, option_type)[float(strike)]["url"]
+
+        for attempt in range(ORDER_MAX_TRIES):
+            try:
+                order_resp = _rh_call(
+                    _submit_option_order,
+                    account_url=account_url,
+                    option_url=option_url,
+                    side=side,
+                    position_effect=position_effect,
+                    credit_or_debit=credit_or_debit,
+                    price=limit_price_str,
+                    quantity=quantity,
+                    ref_id=ref_id
+                )
+                return order_resp
+            except requests.exceptions.HTTPError as ex:
+                if ex.response is not None and ex.response.status_code < 500:
+                    log.error(f"[RH] Order ref_id={ref_id} rejected "
+                              f"({ex.response.status_code}): {ex.response.text}")
+                    return None
+                log.warning(f"[RH] Order ref_id={ref_id} failed (try {attempt + 1}/{ORDER_MAX_TRIES}): {ex}")
+            except (RateLimited, requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout) as ex:
+                log.warning(f"[RH] Order ref_id={ref_id} failed (try {attempt + 1}/{ORDER_MAX_TRIES}): {ex}")
+
+            if breaker_open():
+                log.warning(f"[RH] Circuit breaker open, giving up on order ref_id={ref_id}")
+                return None
+
+            if attempt + 1 < ORDER_MAX_TRIES:
+                time.sleep(_backoff(attempt))
+
+        return None
 
     except Exception as ex:
-        print(f"[RH] Error placing {side.upper()} {option_type.upper()} order: {ex}")
+        log.error(f"[RH] Error placing {side.upper()} {option_type.upper()} order: {ex}", exc_info=True)
         return None
 
 
+# The copier only ever buys UNDERLYING_SYMBOL calls/puts to open and sells
+# them to close; bind those fixed arguments once, keyed by option type.
+_BUY_TO_OPEN = {
+    option_type: functools.partial(place_robinhood_option_order, symbol=UNDERLYING_SYMBOL,
+                                   option_type=option_type, side='buy', position_effect='open')
+    for option_type in ('call', 'put')
+}
+_SELL_TO_CLOSE = {
+    option_type: functools.partial(place_robinhood_option_order, symbol=UNDERLYING_SYMBOL,
+                                   option_type=option_type, side='sell', position_effect='close')
+    for option_type in ('call', 'put')
+}
+
+
 # ---------------------------------------------------------
 # 6. Copy an MT5 position to Robinhood (Buy->Call, Sell->Put)
 # ---------------------------------------------------------
@@ -281,19 +861,20 @@ def copy_mt5_trade_to_robinhood(trade):
     """
     If trade.type=BUY => place a 'buy' call,
        trade.type=SELL => place a 'buy' put.
-    The strike is approximate the underlying's current price,
-    with expiration = today's date.
+    The strike is the listed strike nearest the underlying's current
+    price, with expiration = today's date.
     """
     try:
         if not is_market_open_now():
-            print("[RH] Market CLOSED. Skipping open.")
+            log.info("[RH] Market CLOSED. Skipping open.")
             return None
-
-        can_trade, reason = account_equity_and_pdt_check()
-        if not can_trade:
-            print(f"[RH] PDT/Equity check FAIL: {reason}")
+        if breaker_open():
+            log.warning("[RH] Circuit breaker open. Skipping open.")
             return None
-        print(f"[RH] PDT/Equity check PASS: {reason}")
+
+        # The PDT check (account profile) doesn't depend on the quote
+        # below, so let it run alongside the price lookup
+        pdt_check = rh_lookup_pool.submit(account_equity_and_pdt_check)
 
         # Map trade type
         if trade.type == mt5.ORDER_TYPE_BUY:
@@ -304,49 +885,56 @@ def copy_mt5_trade_to_robinhood(trade):
             option_type = 'put'
 
         quantity = int(trade.volume)
-        symbol = "TSLA"
+        symbol = UNDERLYING_SYMBOL
         today_str = date.today().strftime("%Y-%m-%d")
 
+        # Today's listed strikes: also independent of the quote
+        chain_lookup = rh_lookup_pool.submit(get_option_chain, symbol, today_str, option_type)
+
         # Underlying last price
         try:
-            last_price_str = rs.robinhood.stocks.get_latest_price(symbol, includeExtendedHours=True)[0]
+            last_price_str = _rh_call(rs.robinhood.stocks.get_latest_price, symbol, includeExtendedHours=True)[0]
             last_price = float(last_price_str)
         except Exception as ex:
-            print(f"[RH] Error getting underlying price: {ex}")
+            log.error(f"[RH] Error getting underlying price: {ex}", exc_info=True)
             return None
 
-        strike_price = round(last_price, 2)
+        can_trade, reason = pdt_check.result()
+        if not can_trade:
+            log.warning(f"[RH] PDT/Equity check FAIL: {reason}")
+            return None
+        log.info(f"[RH] PDT/Equity check PASS: {reason}")
 
-        # get best bid
+        # get best bid, at the listed strike closest to the underlying
         try:
-            best_bid_list = rs.robinhood.options.find_options_by_expiration_and_strike(
-                inputSymbols=symbol,
-                expirationDate=today_str,
-                strikePrice=str(strike_price),
-                optionType=option_type,
-                info='bid_price'
-            )
-            if not best_bid_list or best_bid_list[0] in (None, 'None'):
-                print(f"[RH] No best bid found => {symbol}, {strike_price}, {option_type}")
+            chain = chain_lookup.result()
+            if not chain:
+                log.warning(f"[RH] No {option_type} chain for {symbol} expiring {today_str}")
                 return None
-            best_bid = float(best_bid_list[0])
+            strike_price = min(chain, key=lambda strike: abs(strike - last_price))
+            instrument = chain[strike_price]
+
+            quote = get_option_quote(instrument)
+            best_bid = quote.get('bid_price') if quote else None
+            if best_bid in (None, 'None'):
+                log.warning(f"[RH] No best bid found => {symbol}, {strike_price}, {option_type}")
+                return None
+            best_bid = float(best_bid)
         except Exception as e:
-            print(f"[RH] Error fetching best bid: {e}")
+            log.error(f"[RH] Error fetching best bid: {e}", exc_info=True)
             return None
 
         limit_price = 1.001 * best_bid  # slightly above best bid
 
-        order_resp = place_robinhood_option_order(
-            symbol=symbol,
+        order_resp = _BUY_TO_OPEN[option_type](
             exp_date=today_str,
             strike=strike_price,
-            option_type=option_type,
             quantity=quantity,
-            side=side,
-            position_effect='open',
-            limit_price=limit_price
+            limit_price=limit_price,
+            ref_id=order_ref_id(trade.ticket, 'open'),
+            option_url=instrument["url"]
         )
-        print("[RH] OPEN order response:", order_resp)
+        log.info(f"[RH] OPEN order response: {order_resp}")
         if not order_resp:
             return None
 
@@ -356,11 +944,12 @@ def copy_mt5_trade_to_robinhood(trade):
             "strike": strike_price,
             "option_type": option_type,
             "quantity": quantity,
-            "side": side
+            "side": side,
+            "mt5_ticket": trade.ticket
         }
 
     except Exception as ex:
-        print(f"[copy_mt5_trade_to_robinhood] Unexpected error: {ex}")
+        log.error(f"[copy_mt5_trade_to_robinhood] Unexpected error: {ex}", exc_info=True)
         return None
 
 
@@ -371,21 +960,25 @@ def close_robinhood_position(rh_info):
     """
     If we 'bought to open', we 'sell to close'. 
     We'll fetch best ask, place slightly below that.
+    Returns the order response, or None if no order was placed.
     """
     try:
         if not rh_info:
-            print("[RH] No rh_info to close.")
+            log.info("[RH] No rh_info to close.")
             return None
 
         if not is_market_open_now():
-            print("[RH] Market CLOSED. Skip close.")
+            log.info("[RH] Market CLOSED. Skip close.")
+            return None
+        if breaker_open():
+            log.warning("[RH] Circuit breaker open. Skip close.")
             return None
 
         can_trade, reason = account_equity_and_pdt_check()
         if not can_trade:
-            print(f"[RH] PDT/Equity check FAIL (closing): {reason}")
+            log.warning(f"[RH] PDT/Equity check FAIL (closing): {reason}")
             return None
-        print(f"[RH] PDT/Equity check PASS (closing): {reason}")
+        log.info(f"[RH] PDT/Equity check PASS (closing): {reason}")
 
         symbol = rh_info["symbol"]
         exp_date = rh_info["expiration_date"]
@@ -393,93 +986,150 @@ def close_robinhood_position(rh_info):
         option_type = rh_info["option_type"]
         quantity = rh_info["quantity"]
         original_side = rh_info["side"]
-
-        if original_side == 'buy':
-            side_to_close = 'sell'
-        else:
-            side_to_close = 'buy'
+        side_to_close = _OPPOSITE_SIDE[original_side]
 
         try:
-            best_ask_list = rs.robinhood.options.find_options_by_expiration_and_strike(
-                inputSymbols=symbol,
-                expirationDate=exp_date,
-                strikePrice=str(strike),
-                optionType=option_type,
-                info='ask_price'
-            )
-            if not best_ask_list or best_ask_list[0] in (None, 'None'):
-                print(f"[RH] No best ask => {symbol}, strike={strike}, type={option_type}")
+            # usually served from the chain/quote caches filled on open
+            instrument = get_option_chain(symbol, exp_date, option_type).get(float(strike))
+            quote = get_option_quote(instrument) if instrument else None
+            best_ask = quote.get('ask_price') if quote else None
+            if best_ask in (None, 'None'):
+                log.warning(f"[RH] No best ask => {symbol}, strike={strike}, type={option_type}")
                 return None
-            best_ask = float(best_ask_list[0])
+            best_ask = float(best_ask)
         except Exception as ex:
-            print(f"[RH] Error fetching best ask (close): {ex}")
+            log.error(f"[RH] Error fetching best ask (close): {ex}", exc_info=True)
             return None
 
         limit_price = 0.995 * best_ask
-        order_resp = place_robinhood_option_order(
-            symbol=symbol,
+        order_args = dict(
             exp_date=exp_date,
             strike=strike,
-            option_type=option_type,
             quantity=quantity,
-            side=side_to_close,
-            position_effect='close',
-            limit_price=limit_price
+            limit_price=limit_price,
+            ref_id=order_ref_id(rh_info.get("mt5_ticket"), 'close'),
+            option_url=instrument["url"]
         )
-        print("[RH] CLOSE order response:", order_resp)
+        if symbol == UNDERLYING_SYMBOL and original_side == 'buy':
+            order_resp = _SELL_TO_CLOSE[option_type](**order_args)
+        else:
+            # e.g. restored state from another symbol/side
+            order_resp = place_robinhood_option_order(symbol=symbol, option_type=option_type,
+                                                      side=side_to_close, position_effect='close',
+                                                      **order_args)
+        log.info(f"[RH] CLOSE order response: {order_resp}")
+        if order_resp:
+            invalidate_profile_cache()  # cash changed
         return order_resp
 
     except Exception as ex:
-        print(f"[close_robinhood_position] Unexpected error: {ex}")
+        log.error(f"[close_robinhood_position] Unexpected error: {ex}", exc_info=True)
         return None
 
 
 # ---------------------------------------------------------
 # 8. If close same day => day trade
 # ---------------------------------------------------------
+def _prune_day_trades(cutoff):
+    """Drop day_trades_count entries on or before 'cutoff' (oldest first)."""
+    while day_trades_count and next(iter(day_trades_count)) <= cutoff:
+        day_trades_count.popitem(last=False)
+
+
 def record_day_trade_if_applicable(open_time):
     global day_trades_count
     try:
-        now_day_str = dt.now().strftime("%Y-%m-%d")
-        open_day_str = open_time.strftime("%Y-%m-%d")
-        if now_day_str == open_day_str:
-            day_trades_count.setdefault(now_day_str, 0)
-            day_trades_count[now_day_str] += 1
-            print(f"[PDT] Day trade count for {now_day_str} => {day_trades_count[now_day_str]}")
+        today = date.today()
+        if open_time.date() == today:
+            with _day_trades_lock:
+                day_trades_count[today] = day_trades_count.get(today, 0) + 1
+                log.info(f"[PDT] Day trade count for {today} => {day_trades_count[today]}")
+                _prune_day_trades(cutoff=today - timedelta(days=7))
+                save_day_trades()
     except Exception as ex:
-        print(f"[record_day_trade_if_applicable] Unexpected error: {ex}")
+        log.error(f"[record_day_trade_if_applicable] Unexpected error: {ex}", exc_info=True)
 
 
 # ---------------------------------------------------------
 # 9. Main monitoring loop
 # ---------------------------------------------------------
-def monitor_trades_forever():
+def _poll_interval(idle_iterations):
+    """Seconds between MT5 polls: doubles per idle poll, capped."""
+    return min(POLL_MAX_INTERVAL, POLL_INTERVAL * 2 ** min(idle_iterations, 4))
+
+
+def _position_closed(ticket):
+    """
+    Whether MT5's deal history shows 'ticket' closed. False if it only
+    has the opening deal(s), i.e. the position vanished from
+    positions_get() without an exit. None if history has nothing to say
+    (caller then trusts the positions diff).
+    """
+    deals = mt5.history_deals_get(position=ticket)
+    if not deals:
+        return None
+    return any(d.entry in (mt5.DEAL_ENTRY_OUT, mt5.DEAL_ENTRY_OUT_BY) for d in deals)
+
+
+async def monitor_trades_forever(shutdown_evt):
     """
-    1) Login loops for MT5 & Robinhood (retry until success).
-    2) Then monitor new/closed trades in a loop indefinitely.
+    1) Login loops for MT5 & Robinhood, in parallel (retry until success).
+    2) Then monitor new/closed trades until 'shutdown_evt' is set.
+       - Each open/close runs as its own task (on rh_pool threads),
+         so one slow Robinhood call doesn't hold up polling.
        - If we lose connection or something fails, we log
-         the error, wait, attempt to re-login, and continue.
+         the error, wait, and continue.
+    On shutdown, opens/closes in flight get SHUTDOWN_GRACE seconds to
+    finish before they are cancelled.
     """
     global day_trades_count
 
-    # 9.1: Login loops for MT5 & Robinhood
-    while True:
-        if login_to_mt5_account_loop():
-            print("[MAIN] Successfully logged into MT5.")
-            break
-        print("[MAIN] Retry MT5 login in 10s...")
-        time.sleep(10)
+    loop = asyncio.get_running_loop()
 
-    while True:
-        if login_to_robinhood_loop():
-            print("[MAIN] Successfully logged into Robinhood.")
-            break
-        print("[MAIN] Retry Robinhood login in 10s...")
-        time.sleep(10)
+    async def pause(seconds):
+        """Sleep up to 'seconds', waking early on shutdown."""
+        try:
+            await asyncio.wait_for(shutdown_evt.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    # Hosts restarted together (e.g. after an outage) would otherwise all
+    # hit MT5 and Robinhood logins in the same instant
+    startup_delay = random.uniform(0, STARTUP_JITTER)
+    log.info(f"[MAIN] Starting in {startup_delay:.1f}s...")
+    await pause(startup_delay)
+
+    async def retry_until_true(login_fn, name):
+        """Run 'login_fn' off the loop until it succeeds; False if shut down first."""
+        attempt = 0
+        while not await loop.run_in_executor(None, login_fn):
+            delay = _backoff(attempt)
+            log.info(f"[MAIN] Retry {name} login in {delay:.1f}s...")
+            await pause(delay)
+            if shutdown_evt.is_set():
+                return False
+            attempt += 1
+        log.info(f"[MAIN] Successfully logged into {name}.")
+        return True
+
+    # 9.1: Login loops for MT5 & Robinhood (exponential backoff). They
+    # don't depend on each other, so both run at once.
+    install_rate_limit_hook()
+    logged_in = await asyncio.gather(
+        retry_until_true(login_to_mt5_account_loop, "MT5"),
+        retry_until_true(login_to_robinhood_loop, "Robinhood"),
+    )
+    if not all(logged_in):
+        return
 
-    print("[MAIN] Ready to monitor trades...")
+    log.info("[MAIN] Ready to monitor trades...")
 
     # 9.2: Prepare to track existing positions
+    # store: mt5_ticket => (rh_info, open_time), kept across restarts
+    ticket_to_rh = load_state()
+    if ticket_to_rh:
+        log.info(f"[MAIN] Restored {len(ticket_to_rh)} copied position(s) from {state_file}.")
+
     old_tickets = set()
     try:
         # Wrap in try/except so if positions_get fails, we skip
@@ -487,61 +1137,220 @@ def monitor_trades_forever():
         if initial_positions:
             old_tickets = {p.ticket for p in initial_positions}
     except Exception as ex:
-        print(f"[MT5] Error fetching initial positions: {ex}")
+        log.error(f"[MT5] Error fetching initial positions: {ex}", exc_info=True)
         old_tickets = set()
+    # Restored tickets that closed while we were down get closed on RH
+    # by the first pass of the loop below
+    old_tickets |= set(ticket_to_rh)
+
+    tasks = set()  # open/close handlers still running
+    opening = {}  # mt5_ticket => task still copying it to RH
+    retry_closes = set()  # closed on MT5, RH close not placed yet (breaker, market closed, ...)
+    close_tries = {}  # mt5_ticket => RH close attempts that weren't placed
+
+    def spawn(coro):
+        task = asyncio.create_task(coro)
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        return task
+
+    async def handle_new(pos):
+        try:
+            rh_info = await loop.run_in_executor(rh_pool, copy_mt5_trade_to_robinhood, pos)
+            if rh_info:
+                ticket_to_rh[pos.ticket] = (rh_info, dt.now())
+                save_ticket_map(ticket_to_rh)
+            else:
+                forget_order_ref_ids(pos.ticket)
+        except Exception as ex:
+            log.error(f"[MAIN] Error copying ticket={pos.ticket}: {ex}", exc_info=True)
 
-    # store: mt5_ticket => (rh_info, open_time)
-    ticket_to_rh = {}
+    def forget_ticket(ticket):
+        del ticket_to_rh[ticket]
+        save_ticket_map(ticket_to_rh)
+        forget_order_ref_ids(ticket)
+        close_tries.pop(ticket, None)
+
+    async def handle_close(ticket):
+        try:
+            # the MT5 position may close while its copy is still being placed
+            open_task = opening.get(ticket)
+            if open_task:
+                await asyncio.wait([open_task])
+            if ticket not in ticket_to_rh:
+                return
+
+            rh_info, open_time = ticket_to_rh[ticket]
+            # e.g. restored from an earlier day: nothing left to close
+            if rh_info["expiration_date"] < date.today().strftime("%Y-%m-%d"):
+                log.error(f"[MAIN] RH option for ticket={ticket} expired {rh_info['expiration_date']}; "
+                          f"dropping it without a close.")
+                forget_ticket(ticket)
+                return
+
+            log.info(f"[MT5] Position closed => ticket={ticket}. Closing on RH...")
+            order_resp = await loop.run_in_executor(rh_pool, close_robinhood_position, rh_info)
+            if not order_resp:
+                tries = close_tries.get(ticket, 0) + 1
+                if tries >= CLOSE_MAX_TRIES:
+                    log.error(f"[MAIN] RH close for ticket={ticket} not placed after {tries} tries; "
+                              f"dropping it, close it on Robinhood by hand.")
+                    forget_ticket(ticket)
+                    return
+                # keep the mapping (and its ref_ids) and try again later
+                log.warning(f"[MAIN] RH close for ticket={ticket} not placed "
+                            f"(try {tries}/{CLOSE_MAX_TRIES}); will retry.")
+                close_tries[ticket] = tries
+                retry_closes.add(ticket)
+                return
+            record_day_trade_if_applicable(open_time)
+            forget_ticket(ticket)
+        except Exception as ex:
+            log.error(f"[MAIN] Error closing ticket={ticket}: {ex}", exc_info=True)
 
     # 9.3: Main monitoring loop
-    while True:
+    # consecutive failed iterations; drives the error backoff
+    attempt = 0
+    # consecutive polls with no opened/closed positions; stretches the poll interval
+    idle_iterations = 0
+    # positions_total() at the last full positions_get()
+    last_total = len(old_tickets)
+    while not shutdown_evt.is_set():
         try:
             # Re-check or keep using an existing session
             # If a major error occurs, we might log out/in again.
 
+            # Honor Robinhood's Retry-After before doing any more work
+            throttle_left = _throttle_until - time.monotonic()
+            if throttle_left > 0:
+                log.warning(f"[MAIN] Robinhood throttled, sleeping {throttle_left:.1f}s...")
+                await pause(throttle_left)
+                continue
+
+            # Closes that didn't go through; their MT5 side is already
+            # gone, so the positions diff won't bring them up again. Only
+            # retried while they could actually be placed
+            if retry_closes and not breaker_open() and is_market_open_now():
+                for ct in retry_closes:
+                    spawn(handle_close(ct))
+                retry_closes.clear()
+
+            # Nothing open now or before: a single int from the terminal
+            # is enough, skip fetching the full position list
+            total = mt5.positions_total()
+            if total == last_total and not old_tickets:
+                attempt = 0
+                idle_iterations += 1
+                await pause(_poll_interval(idle_iterations))
+                continue
+
             # Fetch current positions
             try:
                 current_positions = mt5.positions_get()
+                if current_positions is None:
+                    # None is an error, unless there really is nothing open;
+                    # never read it as "everything closed"
+                    if total != 0:
+                        raise RuntimeError(f"positions_get() returned None, error={mt5.last_error()}")
+                    current_positions = ()
             except Exception as ex:
-                print(f"[MT5] Error in positions_get(): {ex}")
-                time.sleep(5)
+                log.error(f"[MT5] Error in positions_get(): {ex}", exc_info=True)
+                await pause(_backoff(attempt))
+                attempt += 1
                 continue  # skip this iteration
+            last_total = len(current_positions)
 
-            current_tickets = set()
-            if current_positions:
-                current_tickets = {p.ticket for p in current_positions}
+            pos_by_ticket = {p.ticket: p for p in current_positions}
+            # dict key views support set operations directly, so the diff
+            # below needs no extra set of the current tickets
+            current_tickets = pos_by_ticket.keys()
 
-            # (A) new positions
+            # (A) new positions, each copied in its own task (see _rh_call)
             new_tickets = current_tickets - old_tickets
             for nt in new_tickets:
-                pos = next((p for p in current_positions if p.ticket == nt), None)
-                if not pos:
-                    continue
-                print(f"\n[MT5] New position => ticket={nt}, type={pos.type}, price={pos.price_current}")
-                rh_info = copy_mt5_trade_to_robinhood(pos)
-                if rh_info:
-                    ticket_to_rh[nt] = (rh_info, dt.now())
-
-            # (B) closed positions
+                pos = pos_by_ticket[nt]
+                log.info(f"[MT5] New position => ticket={nt}, type={pos.type}, price={pos.price_current}")
+                opening[nt] = spawn(handle_new(pos))
+                opening[nt].add_done_callback(lambda _, nt=nt: opening.pop(nt, None))
+
+            # (B) closed positions, confirmed against the deal history
             closed_tickets = old_tickets - current_tickets
+            unconfirmed = set()
             for ct in closed_tickets:
-                if ct in ticket_to_rh:
-                    print(f"[MT5] Position closed => ticket={ct}. Closing on RH...")
-                    rh_info, open_time = ticket_to_rh[ct]
-                    close_robinhood_position(rh_info)
-                    record_day_trade_if_applicable(open_time)
-                    del ticket_to_rh[ct]
-
-            # Update old tickets
-            old_tickets = current_tickets
+                if ct in ticket_to_rh or ct in opening:
+                    if _position_closed(ct) is False:
+                        log.warning(f"[MT5] Ticket={ct} missing from positions but has no exit deal; rechecking next poll.")
+                        unconfirmed.add(ct)
+                        continue
+                    spawn(handle_close(ct))
+
+            # Update old tickets; unchanged (the usual case) means no rebuild
+            if new_tickets or closed_tickets:
+                old_tickets = current_tickets | unconfirmed
+            attempt = 0
+            if new_tickets or closed_tickets:
+                idle_iterations = 0
+            else:
+                idle_iterations += 1
 
         except Exception as ex:
-            print(f"[MAIN LOOP] Unexpected error: {ex}")
-            # Possibly re-init or re-login. We'll try a short wait
-            time.sleep(10)
+            log.error(f"[MAIN LOOP] Unexpected error: {ex}", exc_info=True)
+            # Possibly re-init or re-login. Back off before retrying
+            await pause(_backoff(attempt))
+            attempt += 1
+
+        # Sleep before next iteration, longer while nothing is happening
+        await pause(_poll_interval(idle_iterations))
+
+    # 9.4: Shutdown requested. Cancelling a task doesn't stop an order
+    # already being submitted on a worker thread, so let those finish.
+    if tasks:
+        log.info(f"[MAIN] Waiting up to {SHUTDOWN_GRACE}s for {len(tasks)} open/close task(s)...")
+        _, unfinished = await asyncio.wait(tasks, timeout=SHUTDOWN_GRACE)
+        for task in unfinished:
+            task.cancel()
+
+
+def _install_shutdown_handlers(loop, shutdown_evt):
+    """Set 'shutdown_evt' on SIGINT/SIGTERM."""
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, shutdown_evt.set)
+        except NotImplementedError:
+            # Windows event loops (where the MT5 terminal runs) lack
+            # add_signal_handler; fall back to a plain signal handler
+            signal.signal(sig, lambda *_: loop.call_soon_threadsafe(shutdown_evt.set))
+
 
-        # A brief sleep before next iteration
-        time.sleep(2)
+def close_sessions():
+    """Release the MT5 terminal connection, the Robinhood session and the state file."""
+    global _state_shelf
+
+    try:
+        mt5.shutdown()
+    except Exception as ex:
+        log.error(f"[MAIN] Error during mt5.shutdown(): {ex}", exc_info=True)
+    try:
+        rs.robinhood.authentication.logout()
+    except Exception as ex:
+        log.error(f"[MAIN] Error during Robinhood logout: {ex}", exc_info=True)
+    with _state_lock:
+        if _state_shelf is not None:
+            _state_shelf.close()
+            _state_shelf = None
+    log.info("[MAIN] Shut down cleanly.")
+
+
+async def main():
+    """Run the copier until SIGINT/SIGTERM, then shut down cleanly."""
+    shutdown_evt = asyncio.Event()
+    _install_shutdown_handlers(asyncio.get_running_loop(), shutdown_evt)
+    try:
+        await monitor_trades_forever(shutdown_evt)
+    finally:
+        close_sessions()
+        rh_pool.shutdown(wait=False)
+        rh_lookup_pool.shutdown(wait=False)
 
 
 # ---------------------------------------------------------
@@ -549,9 +1358,13 @@ def monitor_trades_forever():
 # ---------------------------------------------------------
 if __name__ == "__main__":
     """
-    We'll run monitor_trades_forever() which:
+    We'll run main(), whose monitor_trades_forever():
     1) Repeatedly attempts logins to MT5 and RH
-    2) Monitors trades in an infinite loop, 
+    2) Monitors trades until SIGINT/SIGTERM, 
        handling errors along the way.
     """
-    monitor_trades_forever()
+    log_listener = setup_logging()
+    try:
+        asyncio.run(main())
+    finally:
+        log_listener.stop()
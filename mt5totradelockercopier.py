@@ -20,27 +20,64 @@ import time
 import os
 import json
 import traceback
+import concurrent.futures
 from datetime import datetime as dt
 from tradelocker import TLAPI  # Ensure this is correctly installed and accessible
 
+try:
+    import orjson  # optional: faster JSON for the mapping/credentials files
+except ImportError:
+    orjson = None
+
 # ------------------- Global Variables & Configuration -------------------
 MAGIC_NUMBER = 15  # Only copy trades with this magic number
 
 MT5_CREDENTIALS_FILE = "mt5_credentials.json"
+_creds_cache = None  # parsed "account_1" of MT5_CREDENTIALS_FILE, see get_mt5_credentials
 TRADE_MAPPING_FILE = "ticket_to_tradelocker.json"  # Optional: Persist mapping between restarts
 
+# TradeLocker has no bulk order endpoint; positions opened in the same
+# poll (e.g. basket EAs) are placed concurrently on this pool instead
+ORDER_WORKERS = 8
+order_pool = concurrent.futures.ThreadPoolExecutor(max_workers=ORDER_WORKERS)
+
+# Polling interval in seconds: back to the minimum whenever a position opens
+# or closes, otherwise stretched by POLL_BACKOFF per quiet poll up to the max
+POLL_MIN_INTERVAL = 0.1
+POLL_MAX_INTERVAL = 5
+POLL_BACKOFF = 1.5
+
+# ------------------- JSON Helpers -------------------
+def read_json(file_path):
+    """
+    Parse a JSON file, with orjson if it is installed (stdlib json otherwise).
+    """
+    if orjson:
+        with open(file_path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(file_path, 'r') as f:
+        return json.load(f)
+
+def write_json(data, f):
+    """
+    Serialize 'data' as indented JSON into the binary file 'f', with orjson
+    if it is installed (stdlib json otherwise).
+    """
+    if orjson:
+        f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        f.write(json.dumps(data, indent=4).encode())
+
 # ------------------- Trade Mapping -------------------
 def load_trade_mapping(file_path):
     """
     Load the trade mapping from a JSON file.
-    Returns a dictionary mapping MT5 ticket to TradeLocker order ID.
+    Returns a dictionary mapping MT5 ticket (as a string, the way JSON
+    stores keys) to TradeLocker order ID.
     """
     if os.path.exists(file_path):
         try:
-            with open(file_path, 'r') as f:
-                mapping = json.load(f)
-            # Convert keys to integers
-            mapping = {int(k): v for k, v in mapping.items()}
+            mapping = read_json(file_path)
             print(f"[Mapping] Loaded existing trade mapping from {file_path}.")
             return mapping
         except Exception as e:
@@ -53,21 +90,40 @@ def load_trade_mapping(file_path):
 def save_trade_mapping(mapping, file_path):
     """
     Save the trade mapping to a JSON file.
+    Written to a temporary file first and renamed over the old one, so a
+    crash mid-write never leaves a truncated mapping behind.
     """
+    tmp_path = file_path + ".tmp"
     try:
-        with open(file_path, 'w') as f:
-            # Convert keys to strings for JSON serialization
-            json.dump({str(k): v for k, v in mapping.items()}, f, indent=4)
+        with open(tmp_path, 'wb') as f:
+            # Keys are already strings (see copy_trades)
+            write_json(mapping, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
         print(f"[Mapping] Trade mapping saved to {file_path}.")
     except Exception as e:
         print(f"[Mapping] Error saving mapping file: {e}.")
 
 # ------------------- MT5 Authentication -------------------
+def get_mt5_credentials():
+    """
+    Returns "account_1" from MT5_CREDENTIALS_FILE, read from disk once and
+    reused by later login retries. login_to_mt5 drops the cached copy when
+    MT5 rejects it, so a corrected file is picked up on the next retry.
+    """
+    global _creds_cache
+    if _creds_cache is None:
+        _creds_cache = read_json(MT5_CREDENTIALS_FILE)["account_1"]
+    return _creds_cache
+
 def login_to_mt5():
     """
-    Logs into MT5 using credentials from the JSON file.
+    Logs into MT5 using credentials from the JSON file (see get_mt5_credentials).
     Returns True if successful, False otherwise.
     """
+    global _creds_cache
+
     if not os.path.exists(MT5_CREDENTIALS_FILE):
         default_data = {
             "account_1": {
@@ -76,14 +132,14 @@ def login_to_mt5():
                 "server": "YOUR_MT5_SERVER"
             }
         }
-        with open(MT5_CREDENTIALS_FILE, 'w') as f:
-            json.dump(default_data, f, indent=4)
+        with open(MT5_CREDENTIALS_FILE, 'wb') as f:
+            write_json(default_data, f)
         print(f"[MT5] Created {MT5_CREDENTIALS_FILE}. Please fill in your MT5 credentials.")
+        _creds_cache = None
         return False
 
     try:
-        with open(MT5_CREDENTIALS_FILE, 'r') as f:
-            creds = json.load(f)["account_1"]
+        creds = get_mt5_credentials()
     except Exception as e:
         print(f"[MT5] Error reading credentials: {e}")
         return False
@@ -96,6 +152,7 @@ def login_to_mt5():
 
         if not mt5.login(int(creds['login']), creds['password'], creds['server']):
             print(f"[MT5] Failed to login to account {creds['login']}")
+            _creds_cache = None  # re-read the file next time, in case it was fixed
             return False
 
         terminal_info = mt5.terminal_info()
@@ -113,6 +170,7 @@ def login_to_mt5():
 
     except Exception as e:
         print(f"[MT5] Exception during login: {e}")
+        _creds_cache = None  # e.g. a non-numeric login; re-read the file next time
         return False
 
 # ------------------- TradeLocker Authentication -------------------
@@ -148,31 +206,53 @@ def login_to_tradelocker():
 def copy_trades(tl, ticket_to_tradelocker, mapping_file):
     """
     Monitors MT5 for new and closed positions and replicates them in TradeLocker.
+    Polls quickly while positions are changing and slows down while idle; if
+    neither the position count nor the equity has moved since the last poll,
+    the full position list isn't fetched at all.
 
     Args:
         tl (TLAPI): The TradeLocker API client.
-        ticket_to_tradelocker (dict): Mapping from MT5 ticket to TradeLocker order details.
+        ticket_to_tradelocker (dict): Mapping from MT5 ticket (str) to TradeLocker order details.
         mapping_file (str): File path to save/load the mapping.
     """
     old_tickets = set(ticket_to_tradelocker.keys())
+    interval = POLL_MIN_INTERVAL
+    # (positions_total(), equity) at the last fully processed poll
+    last_snapshot = None
 
     while True:
         try:
+            # Cheap check first: two scalars instead of every position
+            account = mt5.account_info()
+            snapshot = (mt5.positions_total(), account.equity if account else None)
+            if None not in snapshot and snapshot == last_snapshot:
+                interval = min(POLL_MAX_INTERVAL, interval * POLL_BACKOFF)
+                time.sleep(interval)
+                continue
+
+            # positions_get() can't filter by magic number, so filter here;
+            # other positions are never tracked at all. Tickets become strings
+            # here, once, to match the JSON-backed mapping's keys.
             current_positions = mt5.positions_get()
-            current_tickets = {p.ticket for p in current_positions} if current_positions else set()
-
-            # Detect new positions
+            if current_positions is None:
+                # None is an error, unless there really is nothing open;
+                # never read it as "everything closed"
+                if snapshot[0] != 0:
+                    raise RuntimeError(f"positions_get() returned None, error={mt5.last_error()}")
+                current_positions = ()
+            by_ticket = {str(p.ticket): p for p in current_positions if p.magic == MAGIC_NUMBER}
+            current_tickets = by_ticket.keys()
+
+            # Set when ticket_to_tradelocker changes; saved once per poll
+            dirty = False
+
+            # Detect new positions, and place their orders concurrently
             new_tickets = current_tickets - old_tickets
+            placing = {}
             for ticket in new_tickets:
-                position = next((p for p in current_positions if p.ticket == ticket), None)
-                if not position:
-                    continue
+                position = by_ticket[ticket]
                 print(f"\n[MT5] New position detected: Ticket={position.ticket}, Symbol={position.symbol}, Type={'BUY' if position.type == mt5.ORDER_TYPE_BUY else 'SELL'}, Magic={position.magic}")
 
-                if position.magic != MAGIC_NUMBER:
-                    print(f"[MT5] Position magic number {position.magic} does not match {MAGIC_NUMBER}. Skipping.")
-                    continue
-
                 # Prepare TradeLocker order details
                 tradelocker_order = {
                     "symbol": position.symbol,
@@ -183,11 +263,14 @@ def copy_trades(tl, ticket_to_tradelocker, mapping_file):
                 }
 
                 # Place order in TradeLocker
-                order_id = place_tradelocker_order(tl, tradelocker_order)
+                placing[ticket] = order_pool.submit(place_tradelocker_order, tl, tradelocker_order)
+
+            for ticket, future in placing.items():
+                order_id = future.result()
                 if order_id:
                     print(f"[TradeLocker] Placed order ID {order_id} for MT5 Ticket {ticket}.")
                     ticket_to_tradelocker[ticket] = order_id
-                    save_trade_mapping(ticket_to_tradelocker, mapping_file)
+                    dirty = True
                 else:
                     print(f"[TradeLocker] Failed to place order for MT5 Ticket {ticket}.")
 
@@ -203,17 +286,27 @@ def copy_trades(tl, ticket_to_tradelocker, mapping_file):
                     if success:
                         print(f"[TradeLocker] Successfully closed order ID {order_id} for MT5 Ticket {ticket}.")
                         del ticket_to_tradelocker[ticket]
-                        save_trade_mapping(ticket_to_tradelocker, mapping_file)
+                        dirty = True
                     else:
                         print(f"[TradeLocker] Failed to close order ID {order_id} for MT5 Ticket {ticket}.")
 
+            if dirty:
+                save_trade_mapping(ticket_to_tradelocker, mapping_file)
+
             old_tickets = current_tickets
+            last_snapshot = snapshot
+            if new_tickets or closed_tickets:
+                interval = POLL_MIN_INTERVAL
+            else:
+                interval = min(POLL_MAX_INTERVAL, interval * POLL_BACKOFF)
 
         except Exception as e:
             print(f"[Copier] Unexpected error: {e}")
             traceback.print_exc()
+            # e.g. terminal disconnected: don't retry at the post-change rate
+            interval = POLL_MAX_INTERVAL
 
-        time.sleep(2)  # Polling interval in seconds
+        time.sleep(interval)
 
 # ------------------- Helper Functions -------------------
 def place_tradelocker_order(tl, order_details):
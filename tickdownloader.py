@@ -1,15 +1,108 @@
 import os
+import sys
+import array
 import struct
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import datetime
 import csv
-from lzma import LZMADecompressor, FORMAT_AUTO
+import collections
+import itertools
+import threading
+import concurrent.futures
+import lzma
+import queue
+import logging
+import logging.handlers
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # only needed for output_format='parquet'
+    pa = pq = None
+
+log = logging.getLogger("tickdl")
+
+# array typecode for a 4-byte unsigned int ('I' on every common platform)
+UINT32_TYPECODE = 'I' if array.array('I').itemsize == 4 else 'L'
+# Dukascopy times are UTC; naive datetimes here are all UTC too
+EPOCH = datetime.datetime(1970, 1, 1)
+MS_PER_HOUR = 3600000
+# Hours newer than this may not be fully published yet, so aren't cached
+CACHE_MIN_AGE = datetime.timedelta(hours=2)
+
+
+def format_timestamps(timestamps_ms):
+    """
+    Yields 'YYYY-MM-DD HH:MM:SS.mmm' for each UTC epoch-millisecond timestamp.
+    strftime runs once per hour for the date/hour prefix; the rest is
+    integer arithmetic. A generator, so writers stream the strings instead
+    of holding an hour's worth in a list.
+    """
+    prefix_hour = None
+    for timestamp_ms in timestamps_ms:
+        hour_ms, offset = divmod(timestamp_ms, MS_PER_HOUR)
+        if hour_ms != prefix_hour:
+            prefix_hour = hour_ms
+            prefix = (EPOCH + datetime.timedelta(hours=hour_ms)).strftime('%Y-%m-%d %H:')
+        yield f"{prefix}{offset // 60000:02d}:{offset // 1000 % 60:02d}.{offset % 1000:03d}"
+
+def setup_logging():
+    """
+    Send 'log' through a QueueHandler: download threads and the writer only
+    enqueue, and a QueueListener thread does the console writes, so a slow
+    terminal never holds up downloading. Returns the listener; stop() it on
+    exit to flush.
+    """
+    log_queue = queue.Queue(-1)
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter("%(message)s"))
+
+    listener = logging.handlers.QueueListener(log_queue, console_handler)
+    listener.start()
+    log.addHandler(logging.handlers.QueueHandler(log_queue))
+    log.setLevel(logging.INFO)
+    log.propagate = False
+    return listener
+
 
 class DukascopyTickDataDownloader:
     endpoint = "https://datafeed.dukascopy.com/datafeed/{symbol}/{year}/{month:02d}/{day:02d}/{hour:02d}h_ticks.bi5"
     headers = {
         'User-Agent': 'Mozilla/5.0'
     }
+    # Symbols that trade through the weekend (see market_closed)
+    always_open_symbols = {'BTCUSD', 'ETHUSD', 'LTCUSD', 'XRPUSD', 'BCHUSD', 'XLMUSD', 'EOSUSD'}
+
+    # Dukascopy data format constants, shared by every instance
+    data_format = '!3I2f'  # (timestamp_ms, ask_price, bid_price, ask_volume, bid_volume)
+    RECORD_SIZE = struct.calcsize(data_format)  # bytes per tick, see parse_ticks
+    # Note that in Dukascopy's bi5 format, ask_volume and bid_volume are floats,
+    # but we will handle them as needed below.
+
+    # One keep-alive session for all instances (see shared_session)
+    _session = None
+    _session_pool_size = 0
+    _session_lock = threading.Lock()
+
+    @classmethod
+    def shared_session(cls, pool_size):
+        """
+        The requests.Session every downloader uses, so several downloads in one
+        process (e.g. one per symbol) reuse the same warm connections. Keeps
+        'pool_size' keep-alive connections, one per download thread, and
+        retries transient 5xx responses. Rebuilt only if a larger pool is asked for.
+        """
+        with cls._session_lock:
+            if cls._session is None or cls._session_pool_size < pool_size:
+                session = requests.Session()
+                session.headers.update(cls.headers)
+                retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504])
+                session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry))
+                cls._session = session
+                cls._session_pool_size = pool_size
+            return cls._session
 
     def __init__(
             self,
@@ -19,7 +112,10 @@ class DukascopyTickDataDownloader:
             base_output_dir='tick_data',
             real_ask=True,
             spread_value=0.0,
-            include_volumes=False
+            include_volumes=False,
+            max_workers=16,
+            output_format='csv',
+            cache_dir='tick_cache'
     ):
         """
         :param symbol: Currency pair symbol (e.g., 'GBPUSD')
@@ -29,6 +125,9 @@ class DukascopyTickDataDownloader:
         :param real_ask: If True, use the real ask from Dukascopy. If False, ask = bid + spread_value
         :param spread_value: The numerical spread to add to the bid if real_ask is False
         :param include_volumes: If True, store real ask_volume and bid_volume; if False, store them as blank
+        :param max_workers: How many hour files to download at once
+        :param output_format: 'csv', or 'parquet' (zstd-compressed, needs pyarrow)
+        :param cache_dir: Where raw .bi5 hour files are kept so reruns skip the download (None to disable)
         """
 
         # 1) Parse and store user inputs
@@ -41,11 +140,16 @@ class DukascopyTickDataDownloader:
         self.real_ask = real_ask
         self.spread_value = spread_value
         self.include_volumes = include_volumes
+        self.max_workers = max_workers
+        if output_format not in ('csv', 'parquet'):
+            raise ValueError(f"output_format must be 'csv' or 'parquet', not {output_format!r}")
+        if output_format == 'parquet' and pa is None:
+            raise ImportError("output_format='parquet' needs pyarrow (pip install pyarrow)")
+        self.output_format = output_format
+        self.cache_dir = cache_dir
+        self.session = self.shared_session(pool_size=max_workers)
 
-        # 3) Dukascopy data format constants
-        self.data_format = '!3I2f'  # (timestamp_ms, ask_price, bid_price, ask_volume, bid_volume)
-        # Note that in Dukascopy's bi5 format, ask_volume and bid_volume are floats,
-        # but we will handle them as needed below.
+        # 3) Dukascopy data format constants: see data_format / RECORD_SIZE above
 
         # 4) Dukascopy point value for each symbol
         # e.g., most currency pairs use 1e5, while USDRUB, XAGUSD, XAUUSD often use 1e3
@@ -65,17 +169,34 @@ class DukascopyTickDataDownloader:
         if not os.path.exists(self.output_dir):
             os.makedirs(self.output_dir)
 
-        # 7) Define the CSV filename within this subfolder
-        self.output_filename = os.path.join(self.output_dir, 'historical_tick_data.csv')
+        # 7) Define the output filename within this subfolder
+        self.output_filename = os.path.join(self.output_dir, f'historical_tick_data.{self.output_format}')
 
     def download_and_save_csv(self):
+        """
+        Runs _download_and_save_csv. Callers that haven't configured logging
+        (e.g. using the class from Python, see README) get the console
+        progress output via setup_logging() for the length of the call.
+        """
+        listener = None if log.hasHandlers() else setup_logging()
+        try:
+            self._download_and_save_csv()
+        finally:
+            if listener:
+                listener.stop()
+                for handler in log.handlers[:]:
+                    log.removeHandler(handler)
+                log.propagate = True
+
+    def _download_and_save_csv(self):
         """
         Main method that:
-          - Opens a single CSV file for the entire date range
+          - Opens a single CSV (or Parquet, see output_format) file for the entire date range
           - Iterates over each date and hour
-          - Downloads and decompresses the data
-          - Parses the data
-          - Writes the final rows to the CSV file
+          - Downloads, decompresses and parses the data on worker threads,
+            up to max_workers hours at a time
+          - Writes the final rows to the output file, in date/hour order,
+            from this thread only
         """
         # 1) Define the CSV columns. We will always have:
         #    timestamp, bid, ask, Flags (value=6)
@@ -85,133 +206,255 @@ class DukascopyTickDataDownloader:
         else:
             fieldnames = ['timestamp', 'bid', 'ask', 'Flags']
 
-        # 2) Open CSV file and set up the writer
-        with open(self.output_filename, 'w', newline='') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-
-            # 3) Iterate from the start_date to the end_date
+        # 2) Open the output file and set up the writer
+        if self.output_format == 'parquet':
+            output = pq.ParquetWriter(self.output_filename, self.parquet_schema(fieldnames), compression='zstd')
+            write_hour = lambda ticks: self.write_parquet_hour(output, ticks)
+        else:
+            output = open(self.output_filename, 'w', newline='')
+            writer = csv.writer(output)
+            writer.writerow(fieldnames)
+            write_hour = lambda ticks: self.write_csv_hour(writer, ticks)
+
+        with output:
+            # 3) Every (date, hour, url) from the start_date to the end_date,
+            #    except weekend hours with nothing to download
+            hours = []
+            skipped = 0
             current_date = self.start_date
             while current_date <= self.end_date:
-                print(f"Processing date: {current_date.strftime('%Y-%m-%d')}")
-
-                # For each date, check the 24 hours in that day
                 for hour in range(24):
+                    if self.market_closed(current_date, hour):
+                        skipped += 1
+                    else:
+                        hours.append((current_date, hour, self.hour_url(current_date, hour)))
+                current_date += datetime.timedelta(days=1)
+            if skipped:
+                log.info(f"Skipping {skipped} weekend hours (market closed).")
+
+            # 4) Download in parallel, but keep at most 2 * max_workers hours
+            #    in flight so a long range isn't buffered in memory
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                hours_iter = iter(hours)
+                pending = collections.deque(
+                    (current_date, hour, pool.submit(self.download_and_parse_hour, current_date, hour, url))
+                    for current_date, hour, url in itertools.islice(hours_iter, 2 * self.max_workers)
+                )
+
+                last_date = None
+                while pending:
+                    current_date, hour, future = pending.popleft()
+                    next_hour = next(hours_iter, None)
+                    if next_hour:
+                        pending.append((*next_hour[:2], pool.submit(self.download_and_parse_hour, *next_hour)))
+
+                    if current_date != last_date:
+                        log.info(f"Processing date: {current_date.strftime('%Y-%m-%d')}")
+                        last_date = current_date
                     try:
-                        data = self.download_hour_data(current_date, hour)
-                        if data:
-                            # Parse ticks
-                            ticks = self.parse_ticks(data, current_date, hour)
-                            # Write ticks to CSV
-                            for tick in ticks:
-                                # If volumes are included, we pass them, otherwise we skip
-                                row_data = {
-                                    'timestamp': tick['timestamp'],
-                                    'bid': tick['bid'],
-                                    'ask': tick['ask'],
-                                    'Flags': 6
-                                }
-
-                                # Conditionally include volumes
-                                if self.include_volumes:
-                                    row_data['bid_volume'] = tick.get('bid_volume', '')
-                                    row_data['ask_volume'] = tick.get('ask_volume', '')
-
-                                writer.writerow(row_data)
-                            print(f"  Hour {hour:02d}: Data saved.")
+                        ticks = future.result()
+                        if ticks:
+                            write_hour(ticks)
+                            log.info(f"  Hour {hour:02d}: Data saved.")
                         else:
-                            print(f"  Hour {hour:02d}: No data.")
+                            log.info(f"  Hour {hour:02d}: No data.")
                     except Exception as e:
-                        print(f"  Hour {hour:02d}: Error occurred - {e}")
-                # Move on to the next date
-                current_date += datetime.timedelta(days=1)
+                        log.error(f"  Hour {hour:02d}: Error occurred - {e}")
 
-        print(f"All data saved to {self.output_filename}")
+        log.info(f"All data saved to {self.output_filename}")
 
-    def download_hour_data(self, date, hour):
+    def market_closed(self, date, hour):
         """
-        Downloads the raw bi5 compressed file for a given date and hour,
-        then returns the decompressed bytes.
+        True for hours the FX market is shut: all of Saturday, Sunday before
+        21:00 UTC and Friday from 22:00 UTC. Dukascopy has no ticks for them,
+        so they aren't requested. Never True for always_open_symbols.
+        """
+        if self.symbol in self.always_open_symbols:
+            return False
+        weekday = date.weekday()
+        return weekday == 5 or (weekday == 6 and hour < 21) or (weekday == 4 and hour >= 22)
+
+    def write_csv_hour(self, writer, ticks):
+        """
+        Writes one hour of ticks (see parse_ticks) to the CSV writer in a
+        single call. Rows are positional tuples zipped straight from the
+        columns, built one at a time as the writer consumes them.
+        """
+        columns = [format_timestamps(ticks['timestamp']), ticks['bid'], ticks['ask'],
+                   itertools.repeat(6, len(ticks['timestamp']))]
+        if self.include_volumes:
+            columns += [ticks['bid_volume'], ticks['ask_volume']]
+        writer.writerows(zip(*columns))
+
+    def parquet_schema(self, fieldnames):
+        """
+        Arrow schema matching the CSV columns. Prices stay float64: they are
+        raw integer points / point_value, which float32 would round.
         """
-        url = self.endpoint.format(
+        types = {
+            'timestamp': pa.timestamp('ms'),
+            'bid': pa.float64(),
+            'ask': pa.float64(),
+            'Flags': pa.int8(),
+            'bid_volume': pa.float32(),
+            'ask_volume': pa.float32(),
+        }
+        return pa.schema([(name, types[name]) for name in fieldnames])
+
+    def write_parquet_hour(self, writer, ticks):
+        """
+        Writes one hour of ticks (see parse_ticks) to the ParquetWriter as
+        one row group.
+        """
+        if not ticks['timestamp']:
+            return
+        columns = dict(ticks, Flags=[6] * len(ticks['timestamp']))
+        writer.write_table(pa.Table.from_pydict(columns, schema=writer.schema))
+
+    def download_and_parse_hour(self, date, hour, url=None):
+        """
+        Worker task: download_hour_data + parse_ticks for one hour, so the
+        decoding overlaps other hours' downloads. None if there's no data.
+        """
+        data = self.download_hour_data(date, hour, url)
+        if data:
+            return self.parse_ticks(data, date, hour)
+        return None
+
+    def hour_url(self, date, hour):
+        """
+        Dukascopy URL of one hour file. Its month is zero-based (January is 00).
+        """
+        return self.endpoint.format(
             symbol=self.symbol,
             year=date.year,
-            month=date.month - 1,  # Dukascopy months are zero-based
+            month=date.month - 1,
             day=date.day,
             hour=hour
         )
-        response = requests.get(url, headers=self.headers)
-        if response.status_code == 200 and response.content:
-            decompressed_data = self.decompress_data(response.content)
-            return decompressed_data
+
+    def download_hour_data(self, date, hour, url=None):
+        """
+        Downloads the raw bi5 compressed file for a given date and hour,
+        then returns the decompressed bytes.
+        Served from cache_dir when an earlier run already fetched it.
+        'url' is the hour's hour_url(), when the caller already built it.
+        """
+        cache_path = self.cache_path(date, hour)
+        cached = bool(cache_path) and os.path.exists(cache_path)
+        if cached:
+            with open(cache_path, 'rb') as f:
+                compressed_data = f.read()
         else:
+            if url is None:
+                url = self.hour_url(date, hour)
+            response = self.session.get(url, timeout=30)
+            if response.status_code != 200:
+                return None
+            compressed_data = response.content
+
+        data = self.decompress_data(compressed_data) if compressed_data else None
+        if compressed_data and data is None:
+            # Corrupt body: never keep it, so the next run downloads it again
+            if cached:
+                self.remove_cache(cache_path)
+        elif not cached and cache_path:
+            # Only finished, published hours: a later run must not reuse a partial one
+            utc_now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+            if date + datetime.timedelta(hours=hour + 1) + CACHE_MIN_AGE <= utc_now:
+                self.write_cache(cache_path, compressed_data)
+        return data
+
+    def cache_path(self, date, hour):
+        """
+        cache_dir/SYMBOL/YYYY/MM/DD/HHh_ticks.bi5 (calendar month, unlike the
+        URL), or None if caching is off.
+        """
+        if not self.cache_dir:
             return None
+        return os.path.join(self.cache_dir, self.symbol, f"{date.year}", f"{date.month:02d}",
+                            f"{date.day:02d}", f"{hour:02d}h_ticks.bi5")
+
+    def write_cache(self, cache_path, compressed_data):
+        """
+        Stores one raw hour file (empty hours too, as empty files). Written
+        to a temporary file and renamed, so an interrupted run never leaves
+        a truncated file that later runs would trust.
+        """
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            tmp_path = cache_path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(compressed_data)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            log.warning(f"Cache write error for {cache_path}: {e}")
+
+    def remove_cache(self, cache_path):
+        """Drops one cached hour file, e.g. one that no longer decompresses."""
+        try:
+            os.remove(cache_path)
+        except OSError as e:
+            log.warning(f"Cache remove error for {cache_path}: {e}")
 
     def decompress_data(self, compressed_data):
         """
-        Decompresses the LZMA (.bi5) data from Dukascopy.
+        Decompresses the LZMA (.bi5) data from Dukascopy, in one call
+        (no decompressor object per hour).
         """
-        decompressor = LZMADecompressor(FORMAT_AUTO)
         try:
-            return decompressor.decompress(compressed_data)
+            return lzma.decompress(compressed_data, format=lzma.FORMAT_AUTO)
         except Exception as e:
-            print(f"Decompression error: {e}")
+            log.error(f"Decompression error: {e}")
             return None
 
     def parse_ticks(self, data, date, hour):
         """
-        Parses the raw binary data into a list of dictionary items, each representing a tick.
+        Parses the raw binary data into columns: a dict of field name => list,
+        with one entry per tick in each list.
 
         Depending on user settings:
           - If self.real_ask == True, we use the ask as in the feed.
           - If self.real_ask == False, we compute ask as bid + self.spread_value.
-          - If self.include_volumes == True, we store actual volumes. Otherwise, store blanks.
+          - If self.include_volumes == True, 'bid_volume'/'ask_volume' columns are included.
           - 'Flags' is not directly stored here but is a constant 6 in the final CSV output.
         """
-        ticks = []
-        data_size = struct.calcsize(self.data_format)
-
-        for offset in range(0, len(data), data_size):
-            chunk = data[offset:offset + data_size]
-            if len(chunk) == data_size:
-                # Unpack the chunk
-                timestamp_ms, ask_price, bid_price, ask_volume, bid_volume = struct.unpack(self.data_format, chunk)
-
-                # Convert date + hour + ms offset to a proper datetime
-                tick_time = date + datetime.timedelta(hours=hour, milliseconds=timestamp_ms)
-
-                # Convert raw prices to decimal form
-                real_bid = bid_price / self.point_value
-                real_ask = ask_price / self.point_value
-
-                # Decide how to handle ask based on user preference
-                if self.real_ask:
-                    final_ask = real_ask
-                else:
-                    final_ask = real_bid + self.spread_value
-
-                # Decide how to handle volumes
-                if self.include_volumes:
-                    final_bid_volume = bid_volume
-                    final_ask_volume = ask_volume
-                else:
-                    # We'll store empty strings for volumes if user doesn't want them
-                    final_bid_volume = ''
-                    final_ask_volume = ''
-
-                tick_dict = {
-                    'timestamp': tick_time.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3],  # e.g., 2024-04-08 17:00:00.123
-                    'bid': real_bid,
-                    'ask': final_ask,
-                    # We won't store the 'Flags' here, but in the CSV write process we set it to 6
-                }
-
-                # If volumes are included, attach them:
-                if self.include_volumes:
-                    tick_dict['bid_volume'] = final_bid_volume
-                    tick_dict['ask_volume'] = final_ask_volume
-
-                ticks.append(tick_dict)
+        data_size = self.RECORD_SIZE
+        usable = len(data) - len(data) % data_size  # ignore a trailing partial record
+
+        # Decode every record at once: read the buffer both as uint32s and
+        # as float32s, then pick each field out with a stride of 5 (a record
+        # is 3 uint32 + 2 float32). Byteswapping and slicing run in C.
+        ints = array.array(UINT32_TYPECODE)
+        ints.frombytes(memoryview(data)[:usable])
+        floats = array.array('f')
+        floats.frombytes(memoryview(data)[:usable])
+        if sys.byteorder == 'little':  # the feed is big-endian
+            ints.byteswap()
+            floats.byteswap()
+        timestamps, ask_prices, bid_prices = ints[0::5], ints[1::5], ints[2::5]
+        ask_volumes, bid_volumes = floats[3::5], floats[4::5]
+
+        # date + hour + ms offset as UTC epoch milliseconds; only the CSV
+        # writer turns them into text (see format_timestamps)
+        hour_start_ms = (date - EPOCH) // datetime.timedelta(milliseconds=1) + hour * MS_PER_HOUR
+        ticks = {
+            'timestamp': [hour_start_ms + timestamp_ms for timestamp_ms in timestamps],
+            # Convert raw prices to decimal form
+            'bid': [bid_price / self.point_value for bid_price in bid_prices],
+        }
+
+        # Decide how to handle ask based on user preference
+        if self.real_ask:
+            ticks['ask'] = [ask_price / self.point_value for ask_price in ask_prices]
+        else:
+            ticks['ask'] = [real_bid + self.spread_value for real_bid in ticks['bid']]
+
+        # If volumes are included, attach them:
+        if self.include_volumes:
+            ticks['bid_volume'] = bid_volumes.tolist()
+            ticks['ask_volume'] = ask_volumes.tolist()
+
         return ticks
 
 # -----------------------------------------------------------------------------
@@ -226,6 +469,7 @@ if __name__ == "__main__":
       - Whether to use real ask or rely on a spread
       - Spread value (if using a spread)
       - Whether or not to include volume data
+      - Output format (CSV or Parquet)
     Everything else remains the same.
     """
     # 1) Prompt user for start and end dates
@@ -258,7 +502,14 @@ if __name__ == "__main__":
     if not symbol:
         symbol = 'GBPUSD'
 
-    # 5) Instantiate and run
+    # 5) Prompt for output format
+    user_output_format = input("Output format, csv or parquet? (default csv): ").strip().lower() or 'csv'
+    if user_output_format not in ('csv', 'parquet'):
+        print("Unknown output format, defaulting to csv")
+        user_output_format = 'csv'
+
+    # 6) Instantiate and run
+    log_listener = setup_logging()
     downloader = DukascopyTickDataDownloader(
         symbol=symbol,
         start_date=start_date,
@@ -266,6 +517,10 @@ if __name__ == "__main__":
         base_output_dir='tick_data',
         real_ask=real_ask_flag,
         spread_value=user_spread,
-        include_volumes=volumes_flag
+        include_volumes=volumes_flag,
+        output_format=user_output_format
     )
-    downloader.download_and_save_csv()
+    try:
+        downloader.download_and_save_csv()
+    finally:
+        log_listener.stop()